@@ -1,6 +1,115 @@
+import itertools
+
+import torch
+
 GRADIENTS_TAG = 1
 LOCAL_LOGIT_TAG = 2
 GLOBAL_LOGIT_TAG = 3
 PARAMETERS_TAG = 4
+GRADIENT_BUCKETS_TAG = 5
 RECEIVE_NAN_CODE = 11
 SEND_NAN_CODE = 12
+
+HALF_PRECISION_DTYPES = (torch.float16, torch.bfloat16)
+
+_MPI_SUM_OPS = {}
+
+
+class GradientBucketsHeader:
+    """Sent in place of pickled gradients when they follow as a flat buffer in buckets.
+
+    Args:
+        dtype (torch.dtype): dtype of the gradients on the wire.
+        bucket_numels (list[int]): number of elements of each bucket, in sending order.
+    """
+
+    def __init__(self, dtype, bucket_numels):
+        self.dtype = dtype
+        self.bucket_numels = list(bucket_numels)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, GradientBucketsHeader)
+            and self.dtype == other.dtype
+            and self.bucket_numels == other.bucket_numels
+        )
+
+    def get_element_slices(self):
+        """Returns the slice of the flat buffer covered by each bucket."""
+        offsets = [0] + list(itertools.accumulate(self.bucket_numels))
+        return [slice(start, end) for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def foreach_copy_(dst, src):
+    """Copies each tensor of src into the corresponding tensor of dst.
+
+    torch._foreach_copy_ is only available from PyTorch 2.1, so older versions fall back
+    to copying the tensors one by one.
+    """
+    with torch.no_grad():
+        if hasattr(torch, "_foreach_copy_"):
+            torch._foreach_copy_(dst, src)
+        else:
+            for d, s in zip(dst, src):
+                d.copy_(s)
+
+
+def to_mpi_buffer(tensor):
+    """Returns a numpy view of the given contiguous cpu tensor which can be passed to mpi4py.
+
+    MPI has no 16-bit floating point datatype, so half precision tensors are viewed as
+    16-bit integers and transferred as raw bits.
+    """
+    if tensor.dtype in HALF_PRECISION_DTYPES:
+        return tensor.view(torch.int16).numpy()
+    return tensor.numpy()
+
+
+def get_mpi_sum_op(dtype):
+    """Returns the MPI reduction operator which sums the buffers of the given dtype.
+
+    Args:
+        dtype (torch.dtype): dtype of the reduced tensors.
+    """
+    from mpi4py import MPI
+
+    if dtype not in HALF_PRECISION_DTYPES:
+        return MPI.SUM
+
+    if dtype not in _MPI_SUM_OPS:
+
+        def _sum(inbuf, outbuf, datatype):
+            torch.frombuffer(outbuf, dtype=dtype).add_(
+                torch.frombuffer(inbuf, dtype=dtype)
+            )
+
+        _MPI_SUM_OPS[dtype] = MPI.Op.Create(_sum, commute=True)
+    return _MPI_SUM_OPS[dtype]
+
+
+def get_gradient_buckets(numels, element_size, bucket_cap_mb=25):
+    """Groups consecutive parameters into buckets of roughly bucket_cap_mb megabytes.
+
+    Args:
+        numels (list[int]): number of elements of each parameter.
+        element_size (int): size in bytes of one element on the wire.
+        bucket_cap_mb (float, optional): maximum size of a bucket in megabytes. A single
+            parameter larger than this forms its own bucket. Defaults to 25.
+
+    Returns:
+        list[tuple[slice, slice]]: for each bucket, the slice of the parameters it contains
+            and the slice of the elements it covers in the flattened parameters.
+    """
+    bucket_cap = int(bucket_cap_mb * 1024 * 1024)
+    buckets = []
+    first_param, first_element, bucket_size = 0, 0, 0
+    offset = 0
+    for i, numel in enumerate(numels):
+        if i > first_param and bucket_size + numel * element_size > bucket_cap:
+            buckets.append((slice(first_param, i), slice(first_element, offset)))
+            first_param, first_element, bucket_size = i, offset, 0
+        bucket_size += numel * element_size
+        offset += numel
+    if first_param < len(numels):
+        buckets.append((slice(first_param, len(numels)), slice(first_element, offset)))
+    return buckets
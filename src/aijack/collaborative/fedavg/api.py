@@ -1,5 +1,3 @@
-import copy
-
 from ..core.api import BaseFedAPI
 
 
@@ -119,10 +117,6 @@ class MPIFedAVGAPI(BaseFedAPI):
             self.comm.Barrier()
 
     def local_train(self, com_cnt):
-        self.party.prev_parameters = []
-        for param in self.party.model.parameters():
-            self.party.prev_parameters.append(copy.deepcopy(param))
-
         self.party.local_train(
             self.local_epoch,
             self.criterion,
@@ -1,8 +1,17 @@
-import copy
+import torch
 
 from ...manager import BaseManager
 from ..core import BaseClient
-from ..core.utils import GRADIENTS_TAG, PARAMETERS_TAG
+from ..core.utils import (
+    GRADIENT_BUCKETS_TAG,
+    GRADIENTS_TAG,
+    PARAMETERS_TAG,
+    GradientBucketsHeader,
+    foreach_copy_,
+    get_gradient_buckets,
+    get_mpi_sum_op,
+    to_mpi_buffer,
+)
 from ..optimizer import AdamFLOptimizer, SGDFLOptimizer
 
 
@@ -42,12 +51,75 @@ class FedAVGClient(BaseClient):
                 optimizer_type_for_global_grad, **optimizer_kwargs_for_global_grad
             )
 
-        self.prev_parameters = []
-        for param in self.model.parameters():
-            self.prev_parameters.append(copy.deepcopy(param))
+        # the buffers of the snapshot are allocated on the first snapshot, since lazy
+        # modules have no materialized parameters yet
+        self._prev_state_dict = None
+        self._snapshot_stale = True
+        self._snapshot_if_materialized()
 
         self.initialized = False
 
+    @property
+    def prev_parameters(self):
+        """Parameters of the last downloaded global model"""
+        if self._snapshot_stale:
+            self._snapshot()
+        return self._prev_parameters
+
+    @prev_parameters.setter
+    def prev_parameters(self, prev_parameters):
+        # replaced as it is, until the next snapshot
+        self._prev_parameters = prev_parameters
+        self._snapshot_stale = False
+
+    def _allocate_snapshot(self):
+        # the snapshot of the parameters lives in one contiguous buffer, of which the
+        # entries of _prev_state_dict are views. the buffers of the model (e.g. running
+        # stats of batch norm) and parameters of mixed dtypes or devices are allocated
+        # one by one.
+        named_parameters = list(self.model.named_parameters())
+        self._prev_state_dict = {
+            k: torch.empty_like(v) for k, v in self.model.state_dict().items()
+        }
+        self._prev_flat = None
+        if len({(p.dtype, p.device) for _, p in named_parameters}) == 1:
+            numels = [p.numel() for _, p in named_parameters]
+            self._prev_flat = torch.empty(
+                sum(numels),
+                dtype=named_parameters[0][1].dtype,
+                device=named_parameters[0][1].device,
+            )
+            for (name, param), view in zip(
+                named_parameters, torch.split(self._prev_flat, numels)
+            ):
+                self._prev_state_dict[name] = view.view(param.shape)
+        self._prev_parameter_views = [
+            self._prev_state_dict[name] for name, _ in named_parameters
+        ]
+
+    def _snapshot(self):
+        # reuse the preallocated buffers instead of cloning the model every round
+        state_dict = self.model.state_dict()
+        if self._prev_state_dict is None or any(
+            self._prev_state_dict[k].device != v.device for k, v in state_dict.items()
+        ):
+            # first snapshot, or the model has been moved to another device
+            self._allocate_snapshot()
+        foreach_copy_(
+            [self._prev_state_dict[k] for k in state_dict.keys()],
+            list(state_dict.values()),
+        )
+        self._prev_parameters = list(self._prev_parameter_views)
+        self._snapshot_stale = False
+
+    def _snapshot_if_materialized(self):
+        # the parameters of lazy modules are materialized by their first forward
+        if not any(
+            isinstance(p, torch.nn.parameter.UninitializedParameter)
+            for p in self.model.parameters()
+        ):
+            self._snapshot()
+
     def _setup_optimizer_for_global_grad(self, optimizer_type, **kwargs):
         if optimizer_type == "sgd":
             self.optimizer_for_gloal_grad = SGDFLOptimizer(
@@ -77,16 +149,19 @@ class FedAVGClient(BaseClient):
 
     def upload_gradients(self):
         """Upload the local gradients"""
-        gradients = []
-        for param, prev_param in zip(self.model.parameters(), self.prev_parameters):
-            gradients.append((prev_param - param) / self.lr)
+        with torch.no_grad():
+            gradients = torch._foreach_sub(
+                self.prev_parameters, list(self.model.parameters())
+            )
+            torch._foreach_div_(gradients, self.lr)
         return gradients
 
     def revert(self):
         """Revert the local model state to the previous global model"""
-        for param, prev_param in zip(self.model.parameters(), self.prev_parameters):
-            if param is not None:
-                param = prev_param
+        if self._snapshot_stale:
+            # no snapshot has been taken yet
+            return
+        self.model.load_state_dict(self._prev_state_dict)
 
     def download(self, new_global_model):
         """Download the new global model"""
@@ -101,9 +176,7 @@ class FedAVGClient(BaseClient):
         if not self.initialized:
             self.initialized = True
 
-        self.prev_parameters = []
-        for param in self.model.parameters():
-            self.prev_parameters.append(copy.deepcopy(param))
+        self._snapshot_if_materialized()
 
     def local_train(
         self, local_epoch, criterion, trainloader, optimizer, communication_id=0
@@ -136,9 +209,62 @@ class FedAVGClient(BaseClient):
 
 def attach_mpi_to_fedavgclient(cls):
     class MPIFedAVGClientWrapper(cls):
-        def __init__(self, comm, *args, **kwargs):
+        """MPI Wrapper for FedAVG-based Client
+
+        Dense gradients are sent as a flat buffer in buckets. Any other payload returned
+        by `upload_gradients` (e.g. sparse or encrypted gradients) is pickled as it is.
+
+        Args:
+            comm: MPI communicator.
+            use_reduce (bool, optional): If True, the local gradients are summed on the server
+                with a single reduction over `comm`. The server must be created with the same
+                option. Defaults to False.
+            comm_dtype (torch.dtype, optional): dtype of the gradients on the wire, e.g.
+                torch.bfloat16 or torch.float16 to halve the communication. The server learns
+                it from the clients. With `use_reduce`, all clients must use the same dtype.
+                Defaults to None (dtype of the model parameters).
+            bucket_cap_mb (float, optional): the gradients are sent in buckets of about this
+                many megabytes, so that computing a bucket overlaps with the transfer of the
+                previous ones. The server learns the buckets from the clients. With
+                `use_reduce`, all clients must use the same value. Defaults to 25.
+        """
+
+        def __init__(
+            self,
+            comm,
+            *args,
+            use_reduce=False,
+            comm_dtype=None,
+            bucket_cap_mb=25,
+            **kwargs,
+        ):
             super(MPIFedAVGClientWrapper, self).__init__(*args, **kwargs)
             self.comm = comm
+            self.use_reduce = use_reduce
+
+            params = list(self.model.parameters())
+            self.comm_dtype = params[0].dtype if comm_dtype is None else comm_dtype
+            numels = [p.numel() for p in params]
+            self.gradient_buckets = get_gradient_buckets(
+                numels,
+                torch.empty((), dtype=self.comm_dtype).element_size(),
+                bucket_cap_mb,
+            )
+            # reusable send buffer, pinned for faster device-to-host copies
+            self.gradient_buffer = torch.empty(
+                sum(numels),
+                dtype=self.comm_dtype,
+                pin_memory=torch.device(self.device).type == "cuda",
+            )
+            self.gradient_buffer_views = [
+                v.view(p.shape)
+                for v, p in zip(torch.split(self.gradient_buffer, numels), params)
+            ]
+            # tells the server the layout of the buffer before the buckets
+            self.gradient_buckets_header = GradientBucketsHeader(
+                self.comm_dtype,
+                [e.stop - e.start for _, e in self.gradient_buckets],
+            )
 
         def action(self):
             self.upload()
@@ -149,10 +275,87 @@ def attach_mpi_to_fedavgclient(cls):
             self.upload_gradient()
 
         def upload_gradient(self, destination_id=0):
+            if type(self).upload_gradients is FedAVGClient.upload_gradients:
+                # the gradients are computed bucket by bucket below
+                gradients = None
+            else:
+                gradients = super(MPIFedAVGClientWrapper, self).upload_gradients()
+                if not self._is_dense(gradients):
+                    if self.use_reduce:
+                        raise TypeError(
+                            "use_reduce requires the gradients to be a list of dense tensors shaped like the model parameters"
+                        )
+                    # e.g. sparse or encrypted gradients, which are pickled as they are
+                    self.comm.send(gradients, dest=destination_id, tag=GRADIENTS_TAG)
+                    return
+
+            from mpi4py import MPI
+
             self.comm.send(
-                super(MPIFedAVGClientWrapper, self).upload_gradients(),
-                dest=destination_id,
-                tag=GRADIENTS_TAG,
+                self.gradient_buckets_header, dest=destination_id, tag=GRADIENTS_TAG
+            )
+            # each bucket is sent as soon as it is written into the buffer, so that the
+            # computation of the remaining buckets overlaps with the communication.
+            # messages between a pair of processes with the same tag are non-overtaking,
+            # hence the server receives the buckets in this order.
+            params = list(self.model.parameters())
+            requests = []
+            for param_slice, element_slice in self.gradient_buckets:
+                if gradients is None:
+                    self._compute_gradient_bucket(param_slice, params)
+                else:
+                    foreach_copy_(
+                        self.gradient_buffer_views[param_slice], gradients[param_slice]
+                    )
+                bucket = self.gradient_buffer[element_slice]
+                if self.use_reduce:
+                    requests.append(
+                        self.comm.Ireduce(
+                            to_mpi_buffer(bucket),
+                            None,
+                            op=get_mpi_sum_op(self.comm_dtype),
+                            root=destination_id,
+                        )
+                    )
+                else:
+                    requests.append(
+                        self.comm.Isend(
+                            to_mpi_buffer(bucket),
+                            dest=destination_id,
+                            tag=GRADIENT_BUCKETS_TAG,
+                        )
+                    )
+            MPI.Request.Waitall(requests)
+
+        def _compute_gradient_bucket(self, param_slice, params):
+            # same as FedAVGClient.upload_gradients, restricted to one bucket
+            views = self.gradient_buffer_views[param_slice]
+            prev_params = self.prev_parameters[param_slice]
+            params = params[param_slice]
+            with torch.no_grad():
+                if all(
+                    p.device.type == "cpu" and p.dtype == self.comm_dtype
+                    for p in params
+                ):
+                    foreach_copy_(views, prev_params)
+                    torch._foreach_sub_(views, params)
+                    torch._foreach_div_(views, self.lr)
+                else:
+                    # computed on the device and in the dtype of the parameters
+                    gradients = torch._foreach_sub(prev_params, params)
+                    torch._foreach_div_(gradients, self.lr)
+                    foreach_copy_(views, gradients)
+
+        def _is_dense(self, gradients):
+            return (
+                isinstance(gradients, (list, tuple))
+                and len(gradients) == len(self.gradient_buffer_views)
+                and all(
+                    isinstance(grad, torch.Tensor)
+                    and grad.layout == torch.strided
+                    and grad.shape == view.shape
+                    for grad, view in zip(gradients, self.gradient_buffer_views)
+                )
             )
 
         def download(self):
@@ -3,7 +3,14 @@ import torch
 
 from ...manager import BaseManager
 from ..core import BaseServer
-from ..core.utils import GRADIENTS_TAG, PARAMETERS_TAG
+from ..core.utils import (
+    GRADIENT_BUCKETS_TAG,
+    GRADIENTS_TAG,
+    PARAMETERS_TAG,
+    GradientBucketsHeader,
+    get_mpi_sum_op,
+    to_mpi_buffer,
+)
 from ..optimizer import AdamFLOptimizer, SGDFLOptimizer
 
 
@@ -99,17 +106,27 @@ class FedAVGServer(BaseServer):
 
     def update_from_gradients(self):
         """Update the global model with the local gradients."""
-        self.aggregated_gradients = [
-            torch.zeros_like(params) for params in self.server_model.parameters()
-        ]
+        if len(self.uploaded_gradients) == 0:
+            self.aggregated_gradients = [
+                torch.zeros_like(params) for params in self.server_model.parameters()
+            ]
+        else:
+            # filled with the weighted gradients of the first client below
+            self.aggregated_gradients = [None] * len(
+                list(self.server_model.parameters())
+            )
         len_gradients = len(self.aggregated_gradients)
 
         for i, gradients in enumerate(self.uploaded_gradients):
+            # a python float, since PaillierTensor does not accept numpy scalars
+            weight = float(self.weight[i])
             for gradient_id in range(len_gradients):
-                self.aggregated_gradients[gradient_id] = (
-                    gradients[gradient_id] * self.weight[i]
-                    + self.aggregated_gradients[gradient_id]
-                )
+                weighted_gradient = gradients[gradient_id] * weight
+                if i == 0:
+                    self.aggregated_gradients[gradient_id] = weighted_gradient
+                else:
+                    # accumulate in place, which also avoids reallocating encrypted gradients
+                    self.aggregated_gradients[gradient_id] += weighted_gradient
 
         if self.server_side_update:
             self.optimizer.step(self.aggregated_gradients)
@@ -145,14 +162,36 @@ class FedAVGServer(BaseServer):
 
 def attach_mpi_to_fedavgserver(cls):
     class MPIFedAVGServerWrapper(cls):
-        """MPI Wrapper for FedAVG-based Server"""
+        """MPI Wrapper for FedAVG-based Server
 
-        def __init__(self, comm, *args, **kwargs):
+        The local gradients are received either as a flat buffer in buckets or, when a
+        client uploads anything other than dense gradients, pickled as they are. The dtype
+        on the wire and the buckets are announced by each client in a header.
+
+        Args:
+            comm: MPI communicator.
+            use_reduce (bool, optional): If True, the local gradients are summed on the server
+                with a single reduction over `comm` and averaged uniformly, instead of being
+                received from each client one by one. The individual gradients are then not
+                available to the server. Defaults to False.
+        """
+
+        def __init__(self, comm, *args, use_reduce=False, **kwargs):
             self.comm = comm
             super(MPIFedAVGServerWrapper, self).__init__(*args, **kwargs)
+            self.use_reduce = use_reduce
             self.num_clients = len(self.clients)
             self.round = 0
 
+            params = list(self.server_model.parameters())
+            self.param_dtype = params[0].dtype
+            self.param_numels = [p.numel() for p in params]
+            self.param_shapes = [p.shape for p in params]
+            # allocated once the clients announce the dtype of the gradients on the wire
+            self.gradient_buffers = [None] * (
+                1 if self.use_reduce else self.num_clients
+            )
+
         def action(self):
             self.receive()
             self.update()
@@ -162,14 +201,114 @@ def attach_mpi_to_fedavgserver(cls):
         def receive(self):
             self.receive_local_gradients()
 
+        def _unflatten_gradients(self, buffer, copy=False):
+            # copy=True returns fresh tensors even when no conversion is needed, so
+            # that the gradients do not alias a buffer reused in the next round
+            return [
+                grad.view(shape).to(self.device, self.param_dtype, copy=copy)
+                for grad, shape in zip(
+                    torch.split(buffer, self.param_numels), self.param_shapes
+                )
+            ]
+
+        def _get_gradient_buffer(self, i, header):
+            # the buckets must cover exactly the parameters, otherwise the receives would
+            # not match the messages of the client
+            if sum(header.bucket_numels) != sum(self.param_numels):
+                raise ValueError(
+                    f"The client sends {sum(header.bucket_numels)} gradients, but the global model has {sum(self.param_numels)} parameters."
+                )
+            if (
+                self.gradient_buffers[i] is None
+                or self.gradient_buffers[i].dtype != header.dtype
+            ):
+                self.gradient_buffers[i] = torch.empty(
+                    sum(self.param_numels), dtype=header.dtype
+                )
+            return self.gradient_buffers[i]
+
         def receive_local_gradients(self):
-            self.uploaded_gradients = []
+            if self.use_reduce:
+                self.reduce_local_gradients()
+                return
+
+            # each client first sends either its gradients pickled as they are, or a
+            # header announcing the buckets in which they follow as a flat buffer
+            payloads = [
+                self.comm.recv(source=client_id, tag=GRADIENTS_TAG)
+                for client_id in self.clients
+            ]
+            # post the receives of every bucket of every client at once, so that the
+            # buckets are transferred while the clients are still preparing the next ones
+            requests = []
+            for i, (client_id, payload) in enumerate(zip(self.clients, payloads)):
+                if not isinstance(payload, GradientBucketsHeader):
+                    continue
+                buffer = self._get_gradient_buffer(i, payload)
+                requests += [
+                    self.comm.Irecv(
+                        to_mpi_buffer(buffer[element_slice]),
+                        source=client_id,
+                        tag=GRADIENT_BUCKETS_TAG,
+                    )
+                    for element_slice in payload.get_element_slices()
+                ]
+            if len(requests) > 0:
+                from mpi4py import MPI
+
+                MPI.Request.Waitall(requests)
+
+            self.uploaded_gradients = [
+                self._preprocess_local_gradients(
+                    self._unflatten_gradients(buffer, copy=True)
+                    if isinstance(payload, GradientBucketsHeader)
+                    else payload
+                )
+                for buffer, payload in zip(self.gradient_buffers, payloads)
+            ]
+
+        def reduce_local_gradients(self):
+            """Receive the average of the local gradients with a reduction"""
+            from mpi4py import MPI
+
+            headers = [
+                self.comm.recv(source=client_id, tag=GRADIENTS_TAG)
+                for client_id in self.clients
+            ]
+            header = headers[0]
+            if any(h != header for h in headers[1:]):
+                raise ValueError(
+                    "All clients must use the same comm_dtype and bucket_cap_mb with use_reduce."
+                )
 
-            while len(self.uploaded_gradients) < self.num_clients:
-                gradients_received = self.comm.recv(tag=GRADIENTS_TAG)
-                self.uploaded_gradients.append(
-                    self._preprocess_local_gradients(gradients_received)
+            # the server takes part in the reduction without adding anything
+            buffer = self._get_gradient_buffer(0, header)
+            buffer.zero_()
+            requests = [
+                self.comm.Ireduce(
+                    MPI.IN_PLACE,
+                    to_mpi_buffer(buffer[element_slice]),
+                    op=get_mpi_sum_op(header.dtype),
+                    root=self.comm.Get_rank(),
+                )
+                for element_slice in header.get_element_slices()
+            ]
+            MPI.Request.Waitall(requests)
+            averaged_gradients = buffer.to(self.param_dtype) / self.num_clients
+            self.uploaded_gradients = [
+                self._preprocess_local_gradients(
+                    self._unflatten_gradients(averaged_gradients)
                 )
+            ]
+
+        def update_from_gradients(self):
+            if not self.use_reduce:
+                return super(MPIFedAVGServerWrapper, self).update_from_gradients()
+
+            # the received gradients are already averaged
+            self.aggregated_gradients = self.uploaded_gradients[0]
+            if self.server_side_update:
+                self.optimizer.step(self.aggregated_gradients)
 
         def distribute(self):
             for client_id in self.clients:
@@ -1,5 +1,3 @@
-import copy
-
 from ..fedavg import FedAVGAPI, MPIFedAVGAPI
 
 
@@ -40,10 +38,6 @@ class MPIFedProxAPI(MPIFedAVGAPI):
         self.mu = mu
 
     def local_train(self, com_cnt):
-        self.party.prev_parameters = []
-        for param in self.party.parameters():
-            self.party.prev_parameters.append(copy.deepcopy(param))
-
         self.party.local_train(
             self.party.prev_parameters,
             self.local_epoch,
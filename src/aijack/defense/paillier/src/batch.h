@@ -0,0 +1,359 @@
+#pragma once
+#include <algorithm>
+#include <vector>
+#include <stdexcept>
+#include "paillier.h"
+#include "parallel.h"
+using namespace std;
+
+// element-wise kernels only spawn threads for batches of at least this many ciphertexts per thread
+const int PAILLIER_MIN_CTS_PER_THREAD = 32;
+
+struct PaillierCipherTextBatch
+{
+    // struct-of-arrays view of ciphertexts encrypted with the same public key
+    PaillierPublicKey pk;
+    vector<Bint> c;
+    vector<int> exponent;
+    double precision = 1e-8;
+
+    int BASE = 16;
+
+    PaillierCipherTextBatch(){};
+    PaillierCipherTextBatch(PaillierPublicKey pk_, int size, Bint c_, int exponent_, double precision_ = 1e-8)
+    {
+        pk = pk_;
+        c = vector<Bint>(size, c_);
+        exponent = vector<int>(size, exponent_);
+        precision = precision_;
+    }
+
+    PaillierCipherTextBatch(vector<PaillierCipherText> &cts)
+    {
+        int num_cts = cts.size();
+        c = vector<Bint>(num_cts);
+        exponent = vector<int>(num_cts);
+        if (num_cts == 0)
+        {
+            return;
+        }
+
+        pk = cts[0].pk;
+        precision = cts[0].precision;
+        for (int i = 0; i < num_cts; i++)
+        {
+            if (cts[i].pk.n != pk.n)
+            {
+                throw runtime_error("public key does not match");
+            }
+            c[i] = cts[i].c;
+            exponent[i] = cts[i].exponent;
+        }
+    }
+
+    int size()
+    {
+        return c.size();
+    }
+
+    void decrease_exponent(int i, int new_exponent)
+    {
+        Bint factor = mp::pow(Bint(BASE), exponent[i] - new_exponent);
+        c[i] = modpow(c[i], factor, pk.n2);
+        exponent[i] = new_exponent;
+    }
+
+    vector<PaillierCipherText> to_ciphertexts()
+    {
+        int num_cts = c.size();
+        vector<PaillierCipherText> cts(num_cts);
+        for (int i = 0; i < num_cts; i++)
+        {
+            cts[i] = PaillierCipherText(pk, c[i], exponent[i], precision);
+        }
+        return cts;
+    }
+};
+
+inline vector<PaillierCipherText> paillier_combine_cipher_batch(vector<PaillierCipherText> cts,
+                                                                vector<PaillierCipherText> others,
+                                                                bool subtract, int n_job)
+{
+    // adds (or subtracts) others to cts element-wise
+    PaillierCipherTextBatch batch(cts);
+    PaillierCipherTextBatch other_batch(others);
+    if (batch.size() > 0 && other_batch.size() > 0 && batch.pk.n != other_batch.pk.n)
+    {
+        throw runtime_error("public key does not match");
+    }
+
+    Bint &n2 = batch.pk.n2;
+    parallel_for(batch.size(), n_job, [&batch, &other_batch, &n2, subtract](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         if (batch.exponent[i] > other_batch.exponent[i])
+                         {
+                             batch.decrease_exponent(i, other_batch.exponent[i]);
+                         }
+                         else if (batch.exponent[i] < other_batch.exponent[i])
+                         {
+                             other_batch.decrease_exponent(i, batch.exponent[i]);
+                         }
+                         if (subtract)
+                         {
+                             // the modular inverse of a ciphertext encrypts the negated plaintext
+                             other_batch.c[i] = boost::integer::mod_inverse(other_batch.c[i], n2);
+                         }
+                         batch.c[i] = (batch.c[i] * other_batch.c[i]) % n2;
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+    return batch.to_ciphertexts();
+}
+
+inline vector<PaillierCipherText> paillier_add_cipher_batch(vector<PaillierCipherText> cts,
+                                                            vector<PaillierCipherText> others,
+                                                            int n_job = 1)
+{
+    return paillier_combine_cipher_batch(cts, others, false, n_job);
+}
+
+inline vector<PaillierCipherText> paillier_sub_cipher_batch(vector<PaillierCipherText> cts,
+                                                            vector<PaillierCipherText> others,
+                                                            int n_job = 1)
+{
+    return paillier_combine_cipher_batch(cts, others, true, n_job);
+}
+
+inline vector<PaillierCipherText> paillier_add_plain_batch(vector<PaillierCipherText> cts,
+                                                           vector<double> pts,
+                                                           int n_job = 1)
+{
+    PaillierCipherTextBatch batch(cts);
+
+    Bint &n2 = batch.pk.n2;
+    parallel_for(batch.size(), n_job, [&batch, &pts, &n2](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         EncodedNumber<double> encoded = EncodedNumber<double>(batch.pk, pts[i], batch.precision);
+                         if (batch.exponent[i] > encoded.exponent)
+                         {
+                             batch.decrease_exponent(i, encoded.exponent);
+                         }
+                         else if (batch.exponent[i] < encoded.exponent)
+                         {
+                             encoded.decrease_exponent(batch.exponent[i]);
+                         }
+                         Bint encrypted_scalar = batch.pk.raw_encrypt(encoded.encoding, 1);
+                         batch.c[i] = (batch.c[i] * encrypted_scalar) % n2;
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+    return batch.to_ciphertexts();
+}
+
+inline vector<PaillierCipherText> paillier_mul_plain_batch(vector<PaillierCipherText> cts,
+                                                           vector<double> pts,
+                                                           int n_job = 1)
+{
+    PaillierCipherTextBatch batch(cts);
+
+    Bint &n = batch.pk.n;
+    Bint &n2 = batch.pk.n2;
+    parallel_for(batch.size(), n_job, [&batch, &pts, &n, &n2](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         EncodedNumber<double> encoded = EncodedNumber<double>(batch.pk, pts[i], batch.precision);
+                         if (n - batch.pk.max_val <= encoded.encoding)
+                         {
+                             // negative plaintext: multiply the inverse of c with the absolute value
+                             Bint neg_c = boost::integer::mod_inverse(batch.c[i], n2);
+                             batch.c[i] = modpow(neg_c, n - encoded.encoding, n2);
+                         }
+                         else
+                         {
+                             batch.c[i] = modpow(batch.c[i], encoded.encoding, n2);
+                         }
+                         batch.exponent[i] += encoded.exponent;
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+    return batch.to_ciphertexts();
+}
+
+inline vector<PaillierCipherText> paillier_add_scalar_batch(vector<PaillierCipherText> cts,
+                                                            double pt,
+                                                            int n_job = 1)
+{
+    // adds the same plaintext to every ciphertext, encoding and encrypting it only once
+    PaillierCipherTextBatch batch(cts);
+    if (batch.size() == 0)
+    {
+        return vector<PaillierCipherText>();
+    }
+
+    EncodedNumber<double> encoded = EncodedNumber<double>(batch.pk, pt, batch.precision);
+    Bint encrypted_scalar = batch.pk.raw_encrypt(encoded.encoding, 1);
+
+    Bint &n2 = batch.pk.n2;
+    parallel_for(batch.size(), n_job, [&batch, &encoded, &encrypted_scalar, &n2](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         if (batch.exponent[i] == encoded.exponent)
+                         {
+                             batch.c[i] = (batch.c[i] * encrypted_scalar) % n2;
+                             continue;
+                         }
+
+                         EncodedNumber<double> aligned = encoded;
+                         if (batch.exponent[i] > aligned.exponent)
+                         {
+                             batch.decrease_exponent(i, aligned.exponent);
+                         }
+                         else
+                         {
+                             aligned.decrease_exponent(batch.exponent[i]);
+                         }
+                         batch.c[i] = (batch.c[i] * batch.pk.raw_encrypt(aligned.encoding, 1)) % n2;
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+    return batch.to_ciphertexts();
+}
+
+inline vector<PaillierCipherText> paillier_mul_scalar_batch(vector<PaillierCipherText> cts,
+                                                            double pt,
+                                                            int n_job = 1)
+{
+    // multiplies every ciphertext by the same plaintext, encoding it only once
+    PaillierCipherTextBatch batch(cts);
+    if (batch.size() == 0)
+    {
+        return vector<PaillierCipherText>();
+    }
+
+    Bint &n = batch.pk.n;
+    Bint &n2 = batch.pk.n2;
+    EncodedNumber<double> encoded = EncodedNumber<double>(batch.pk, pt, batch.precision);
+    // negative plaintext: multiply the inverse of c with the absolute value
+    bool is_negative = n - batch.pk.max_val <= encoded.encoding;
+    Bint abs_encoding = is_negative ? Bint(n - encoded.encoding) : encoded.encoding;
+
+    parallel_for(batch.size(), n_job, [&batch, &encoded, &abs_encoding, is_negative, &n2](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         if (is_negative)
+                         {
+                             batch.c[i] = boost::integer::mod_inverse(batch.c[i], n2);
+                         }
+                         batch.c[i] = modpow(batch.c[i], abs_encoding, n2);
+                         batch.exponent[i] += encoded.exponent;
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+    return batch.to_ciphertexts();
+}
+
+inline vector<PaillierCipherText> paillier_matmul_plain_batch(vector<PaillierCipherText> cts,
+                                                              vector<double> pts,
+                                                              int num_rows, int num_inner, int num_cols,
+                                                              int n_job = 1)
+{
+    // computes the (num_rows, num_cols) product of the row-major encrypted matrix cts of shape
+    // (num_rows, num_inner) and the row-major plaintext matrix pts of shape (num_inner, num_cols)
+    PaillierCipherTextBatch batch(cts);
+    if (batch.size() == 0)
+    {
+        return vector<PaillierCipherText>();
+    }
+
+    Bint &n = batch.pk.n;
+    Bint &n2 = batch.pk.n2;
+
+    // encode each plaintext only once and bring every operand to a common exponent, so that
+    // the products can be accumulated without any further exponent alignment
+    vector<EncodedNumber<double>> encoded;
+    encoded.reserve(pts.size());
+    int min_pt_exponent = 0;
+    for (int i = 0; i < int(pts.size()); i++)
+    {
+        encoded.push_back(EncodedNumber<double>(batch.pk, pts[i], batch.precision));
+        min_pt_exponent = min(min_pt_exponent, encoded[i].exponent);
+    }
+    for (int i = 0; i < int(encoded.size()); i++)
+    {
+        if (encoded[i].exponent > min_pt_exponent)
+        {
+            encoded[i].decrease_exponent(min_pt_exponent);
+        }
+    }
+
+    int min_ct_exponent = *min_element(batch.exponent.begin(), batch.exponent.end());
+    parallel_for(batch.size(), n_job, [&batch, min_ct_exponent](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         if (batch.exponent[i] > min_ct_exponent)
+                         {
+                             batch.decrease_exponent(i, min_ct_exponent);
+                         }
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+
+    // every entry starts as the trivial encryption of zero, i.e. c = 1
+    PaillierCipherTextBatch result(batch.pk, num_rows * num_cols, Bint(1),
+                                   min_ct_exponent + min_pt_exponent, batch.precision);
+
+    // the inverses of the ciphertexts which are multiplied by a negative plaintext are
+    // computed once up front, so that the output entries below are independent
+    vector<bool> has_neg_pt(num_inner, false);
+    for (int k = 0; k < num_inner; k++)
+    {
+        for (int j = 0; j < num_cols; j++)
+        {
+            if (n - batch.pk.max_val <= encoded[k * num_cols + j].encoding)
+            {
+                has_neg_pt[k] = true;
+                break;
+            }
+        }
+    }
+    vector<Bint> neg_c(batch.size());
+    parallel_for(batch.size(), n_job, [&](int start, int end)
+                 {
+                     for (int ik = start; ik < end; ik++)
+                     {
+                         if (has_neg_pt[ik % num_inner])
+                         {
+                             neg_c[ik] = boost::integer::mod_inverse(batch.c[ik], n2);
+                         }
+                     } },
+                 PAILLIER_MIN_CTS_PER_THREAD);
+
+    // split over the output entries rather than the rows, so that an encrypted vector
+    // times a plaintext matrix (num_rows == 1) also runs on n_job threads
+    parallel_for(num_rows * num_cols, n_job, [&](int start, int end)
+                 {
+                     for (int ij = start; ij < end; ij++)
+                     {
+                         int i = ij / num_cols;
+                         int j = ij % num_cols;
+                         Bint &acc = result.c[ij];
+                         for (int k = 0; k < num_inner; k++)
+                         {
+                             Bint &encoding = encoded[k * num_cols + j].encoding;
+                             Bint term;
+                             if (n - batch.pk.max_val <= encoding)
+                             {
+                                 term = modpow(neg_c[i * num_inner + k], n - encoding, n2);
+                             }
+                             else
+                             {
+                                 term = modpow(batch.c[i * num_inner + k], encoding, n2);
+                             }
+                             acc = (acc * term) % n2;
+                         }
+                     } });
+
+    return result.to_ciphertexts();
+}
@@ -9,6 +9,7 @@
 #include <boost/math/special_functions/round.hpp>
 #include "mod_inverse.h"
 #include "prime.h"
+#include "parallel.h"
 using namespace std;
 
 struct PaillierPublicKey;
@@ -136,6 +137,8 @@ struct PaillierSecretKey
     long decrypt2long(PaillierCipherText pt);
     float decrypt2float(PaillierCipherText pt);
     double decrypt2double(PaillierCipherText pt);
+
+    vector<float> decrypt2float_batch(vector<PaillierCipherText> cts, int n_job = 1);
 };
 
 template <typename T>
@@ -224,7 +227,7 @@ struct EncodedNumber
             }
         }
 
-        int factor = pow(BASE, exponent - new_exponent);
+        Bint factor = mp::pow(Bint(BASE), exponent - new_exponent);
         encoding = encoding * factor % pk.n;
         exponent = new_exponent;
     }
@@ -471,3 +474,16 @@ inline double PaillierSecretKey::decrypt2double(PaillierCipherText ct)
 {
     return decrypt<double>(ct);
 }
+
+inline vector<float> PaillierSecretKey::decrypt2float_batch(vector<PaillierCipherText> cts, int n_job)
+{
+    int num_cts = cts.size();
+    vector<float> result(num_cts);
+    parallel_for(num_cts, n_job, [this, &cts, &result](int start, int end)
+                 {
+                     for (int i = start; i < end; i++)
+                     {
+                         result[i] = decrypt<float>(cts[i]);
+                     } });
+    return result;
+}
@@ -0,0 +1,70 @@
+#pragma once
+#include <exception>
+#include <functional>
+#include <thread>
+#include <vector>
+using namespace std;
+
+inline vector<int> get_num_elements_per_thread(int n_job, int num_elements)
+{
+    vector<int> num_elements_per_thread(n_job, num_elements / n_job);
+    for (int i = 0; i < num_elements % n_job; i++)
+    {
+        num_elements_per_thread[i] += 1;
+    }
+    return num_elements_per_thread;
+}
+
+inline void parallel_for(int num_elements, int n_job, function<void(int, int)> func,
+                         int min_elements_per_thread = 1)
+{
+    // calls func(start, end) for disjoint ranges of [0, num_elements).
+    // each thread gets at least min_elements_per_thread elements, so that
+    // small inputs are not dominated by the cost of spawning threads
+    int max_n_job = (num_elements + min_elements_per_thread - 1) / min_elements_per_thread;
+    if (n_job > max_n_job)
+    {
+        n_job = max_n_job;
+    }
+
+    if (n_job <= 1)
+    {
+        func(0, num_elements);
+        return;
+    }
+
+    vector<int> num_elements_per_thread = get_num_elements_per_thread(n_job, num_elements);
+
+    // an exception escaping a thread would call std::terminate, so each worker
+    // keeps it and the first one is rethrown in the calling thread after join
+    vector<exception_ptr> exceptions(n_job);
+    int cnt_elements = 0;
+    vector<thread> threads;
+    for (int i = 0; i < n_job; i++)
+    {
+        int local_num_elements = num_elements_per_thread[i];
+        threads.push_back(thread([&func, &exceptions, i](int start, int end)
+                                 {
+                                     try
+                                     {
+                                         func(start, end);
+                                     }
+                                     catch (...)
+                                     {
+                                         exceptions[i] = current_exception();
+                                     } },
+                                 cnt_elements, cnt_elements + local_num_elements));
+        cnt_elements += local_num_elements;
+    }
+    for (int i = 0; i < n_job; i++)
+    {
+        threads[i].join();
+    }
+    for (int i = 0; i < n_job; i++)
+    {
+        if (exceptions[i])
+        {
+            rethrow_exception(exceptions[i]);
+        }
+    }
+}
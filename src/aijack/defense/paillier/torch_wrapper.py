@@ -3,6 +3,16 @@ import functools
 import numpy as np
 import torch
 
+from aijack_cpp_core import (
+    _paillier_add_cipher_batch,
+    _paillier_add_plain_batch,
+    _paillier_add_scalar_batch,
+    _paillier_matmul_plain_batch,
+    _paillier_mul_plain_batch,
+    _paillier_mul_scalar_batch,
+    _paillier_sub_cipher_batch,
+)
+
 HANDLED_FUNCTIONS = {}
 
 
@@ -17,30 +27,83 @@ def implements(torch_function):
     return decorator
 
 
+def _to_paillier_tensor(cts, shape, input, out=None):
+    """Wraps the ciphertexts returned by a batched c++ kernel
+
+    If out is given, the ciphertexts are written into its ciphertext array instead of
+    allocating a new PaillierTensor.
+    """
+    if out is None:
+        result = np.empty(len(cts), dtype=object)
+        result[:] = cts
+        return PaillierTensor(result.reshape(shape), n_job=input.n_job)
+    if out.shape != shape:
+        raise ValueError(
+            f"output with shape {tuple(out.shape)} doesn't match the broadcast shape {shape}"
+        )
+    # store the new ciphertexts straight into the array of out in row-major order, which
+    # releases the old ones without building an intermediate array
+    out._paillier_np_array.flat[:] = cts
+    return out
+
+
+def _apply_batch(batch_func, input, other, out=None):
+    """Applies the given batched c++ kernel to the broadcasted elements"""
+    paillier_array, other_array = np.broadcast_arrays(input._paillier_np_array, other)
+    cts = batch_func(paillier_array.ravel(), other_array.ravel(), input.n_job)
+    return _to_paillier_tensor(cts, paillier_array.shape, input, out)
+
+
+def _apply_scalar_batch(batch_func, input, scalar, out=None):
+    """Applies the given batched c++ kernel, which encodes the scalar only once"""
+    paillier_array = input._paillier_np_array
+    cts = batch_func(paillier_array.ravel(), float(scalar), input.n_job)
+    return _to_paillier_tensor(cts, paillier_array.shape, input, out)
+
+
+def _to_plain_array(other):
+    return other.detach().cpu().numpy().astype(np.float64)
+
+
 class PaillierTensor(object):
-    """torch.Tensor-like object for Paillier Encryption"""
+    """torch.Tensor-like object for Paillier Encryption
+
+    Args:
+        paillier_array (list | np.ndarray): array of PaillierCipherText
+        n_job (int, optional): number of threads used for the batched operations. Defaults to 1.
+    """
 
-    def __init__(self, paillier_array):
+    def __init__(self, paillier_array, n_job=1):
         if type(paillier_array) == list:
             self._paillier_np_array = np.array(paillier_array)
         elif type(paillier_array) == np.ndarray:
             self._paillier_np_array = paillier_array
         else:
             raise TypeError(f"{type(paillier_array)} is not supported.")
+        self.n_job = n_job
 
     def __repr__(self):
         return "PaillierTensor"
 
     def decrypt(self, sk, device="cpu"):
-        return torch.Tensor(
-            np.vectorize(lambda x: sk.decrypt2float(x))(self._paillier_np_array)
-        ).to(device)
+        decrypted = np.array(
+            sk.decrypt2float_batch(self._paillier_np_array.ravel(), self.n_job),
+            dtype=np.float32,
+        )
+        return torch.from_numpy(decrypted.reshape(self.shape)).to(device)
+
+    @property
+    def shape(self):
+        return torch.Size(self._paillier_np_array.shape)
 
     def tensor(self, sk=None):
+        """Returns the decrypted tensor if the secret key is given. Otherwise, returns a
+        zero tensor of the same shape as a stride-0 view, which does not allocate memory.
+        """
         if sk is not None:
-            return self.decypt(sk)
+            return self.decrypt(sk)
         else:
-            return torch.zeros(self._paillier_np_array.shape)
+            return torch.zeros((), dtype=torch.float32).expand(self.shape)
 
     def numpy(self):
         return self._paillier_np_array
@@ -53,52 +116,105 @@ class PaillierTensor(object):
 
     @classmethod
     def __torch_function__(cls, func, types, args=(), kwargs=None):
-        if kwargs is None:
-            kwargs = {}
-        if func not in HANDLED_FUNCTIONS or not all(
+        handled_function = HANDLED_FUNCTIONS.get(func)
+        if handled_function is None:
+            return NotImplemented
+        # the set lookup covers the common case without scanning the class hierarchy
+        if not _ALLOWED_TYPES.issuperset(types) and not all(
             issubclass(t, (torch.Tensor, PaillierTensor)) for t in types
         ):
             return NotImplemented
-        return HANDLED_FUNCTIONS[func](*args, **kwargs)
+        if kwargs is None:
+            kwargs = {}
+        return handled_function(*args, **kwargs)
 
     @implements(torch.add)
-    def add(input, other):
+    def add(input, other, out=None):
         if type(other) in [int, float]:
-            return PaillierTensor(input._paillier_np_array + other)
-        elif type(other) in [torch.Tensor, PaillierTensor]:
-            return PaillierTensor(
-                input._paillier_np_array + other.detach().cpu().numpy()
+            return _apply_scalar_batch(_paillier_add_scalar_batch, input, other, out)
+        elif type(other) == torch.Tensor:
+            return _apply_batch(
+                _paillier_add_plain_batch, input, _to_plain_array(other), out
             )
+        elif type(other) == PaillierTensor:
+            return _apply_batch(_paillier_add_cipher_batch, input, other.numpy(), out)
         else:
             raise NotImplementedError(f"{type(other)} is not supported.")
 
     @implements(torch.sub)
-    def sub(input, other):
+    def sub(input, other, out=None):
         if type(other) in [int, float]:
-            return PaillierTensor(input._paillier_np_array + (-1) * other)
-        elif type(other) in [torch.Tensor, PaillierTensor]:
-            return PaillierTensor(
-                input._paillier_np_array + (-1) * other.detach().cpu().numpy()
+            return _apply_scalar_batch(_paillier_add_scalar_batch, input, -other, out)
+        elif type(other) == torch.Tensor:
+            return _apply_batch(
+                _paillier_add_plain_batch, input, -1 * _to_plain_array(other), out
             )
+        elif type(other) == PaillierTensor:
+            return _apply_batch(_paillier_sub_cipher_batch, input, other.numpy(), out)
         else:
             raise NotImplementedError(f"{type(other)} is not supported.")
 
     @implements(torch.mul)
-    def mul(input, other):
+    def mul(input, other, out=None):
         if type(other) in [int, float]:
-            return PaillierTensor(input._paillier_np_array * other)
-        elif type(other) in [torch.Tensor, PaillierTensor]:
-            return PaillierTensor(
-                input._paillier_np_array * other.detach().cpu().numpy()
+            return _apply_scalar_batch(_paillier_mul_scalar_batch, input, other, out)
+        elif type(other) == torch.Tensor:
+            return _apply_batch(
+                _paillier_mul_plain_batch, input, _to_plain_array(other), out
             )
         else:
             raise NotImplementedError(f"{type(other)} is not supported.")
 
+    @implements(torch.Tensor.add_)
+    def add_(self, other):
+        """In-place version of add, which overwrites the ciphertexts of this tensor"""
+        return torch.add(self, other, out=self)
+
+    @implements(torch.Tensor.sub_)
+    def sub_(self, other):
+        """In-place version of sub, which overwrites the ciphertexts of this tensor"""
+        return torch.sub(self, other, out=self)
+
+    @implements(torch.Tensor.mul_)
+    def mul_(self, other):
+        """In-place version of mul, which overwrites the ciphertexts of this tensor"""
+        return torch.mul(self, other, out=self)
+
+    @implements(torch.matmul)
+    def matmul(input, other):
+        if type(other) != torch.Tensor:
+            raise NotImplementedError(f"{type(other)} is not supported.")
+        if input._paillier_np_array.ndim not in [1, 2] or other.dim() not in [1, 2]:
+            raise NotImplementedError("only 1-D and 2-D operands are supported.")
+
+        paillier_matrix = np.atleast_2d(input._paillier_np_array)
+        plain_matrix = _to_plain_array(other)
+        if plain_matrix.ndim == 1:
+            plain_matrix = plain_matrix[:, np.newaxis]
+        num_rows, num_inner = paillier_matrix.shape
+        if plain_matrix.shape[0] != num_inner:
+            raise ValueError(
+                f"shapes {tuple(input.shape)} and {tuple(other.shape)} cannot be multiplied"
+            )
+        num_cols = plain_matrix.shape[1]
+
+        result = np.empty(num_rows * num_cols, dtype=object)
+        result[:] = _paillier_matmul_plain_batch(
+            paillier_matrix.ravel(),
+            plain_matrix.ravel(),
+            num_rows,
+            num_inner,
+            num_cols,
+            input.n_job,
+        )
+        result_shape = input.shape[:-1] + other.shape[1:]
+        return PaillierTensor(result.reshape(result_shape), n_job=input.n_job)
+
     def __add__(self, other):
         return torch.add(self, other)
 
     def __iadd__(self, other):
-        self = torch.add(self, other)
+        return self.add_(other)
 
     def __radd__(self, other):
         return self.__add__(other)
@@ -107,7 +223,7 @@ class PaillierTensor(object):
         return torch.sub(self, other)
 
     def __isub__(self, other):
-        self = torch.sub(self, other)
+        return self.sub_(other)
 
     def __rsub__(self, other):
         return self.__sub__(other)
@@ -115,5 +231,14 @@ class PaillierTensor(object):
     def __mul__(self, other):
         return torch.mul(self, other)
 
+    def __imul__(self, other):
+        return self.mul_(other)
+
     def __rmul__(self, other):
         return self.__mul__(other)
+
+    def __matmul__(self, other):
+        return torch.matmul(self, other)
+
+
+_ALLOWED_TYPES = frozenset((torch.Tensor, PaillierTensor))
@@ -10,6 +10,7 @@
 #include "aijack/defense/kanonymity/core/anonymizer.h"
 #include "aijack/defense/paillier/src/paillier.h"
 #include "aijack/defense/paillier/src/keygenerator.h"
+#include "aijack/defense/paillier/src/batch.h"
 #include "aijack/collaborative/tree/xgboost/xgboost.h"
 #include "aijack/collaborative/tree/secureboost/secureboost.h"
 
@@ -85,9 +86,41 @@ PYBIND11_MODULE(aijack_cpp_core, m)
         .def("decrypt2long", &PaillierSecretKey::decrypt2long)
         .def("decrypt2float", &PaillierSecretKey::decrypt2float)
         .def("decrypt2double", &PaillierSecretKey::decrypt2double)
+        .def("decrypt2float_batch", &PaillierSecretKey::decrypt2float_batch,
+             py::arg("cts"), py::arg("n_job") = 1,
+             py::call_guard<py::gil_scoped_release>())
         .def("get_publickeyvalues", &PaillierSecretKey::get_publickeyvalues)
         .def("get_secretkeyvalues", &PaillierSecretKey::get_secretkeyvalues);
 
+    m.def("_paillier_add_cipher_batch", &paillier_add_cipher_batch,
+          py::arg("cts"), py::arg("others"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_sub_cipher_batch", &paillier_sub_cipher_batch,
+          py::arg("cts"), py::arg("others"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_add_plain_batch", &paillier_add_plain_batch,
+          py::arg("cts"), py::arg("others"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_mul_plain_batch", &paillier_mul_plain_batch,
+          py::arg("cts"), py::arg("others"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_add_scalar_batch", &paillier_add_scalar_batch,
+          py::arg("cts"), py::arg("other"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_mul_scalar_batch", &paillier_mul_scalar_batch,
+          py::arg("cts"), py::arg("other"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("_paillier_matmul_plain_batch", &paillier_matmul_plain_batch,
+          py::arg("cts"), py::arg("pts"), py::arg("num_rows"), py::arg("num_inner"),
+          py::arg("num_cols"), py::arg("n_job") = 1,
+          py::call_guard<py::gil_scoped_release>());
+
     py::class_<XGBoostParty>(m, "XGBoostParty")
         .def(py::init<vector<vector<float>>, int, vector<int>, int,
                       int, float, int, bool, int>())
@@ -0,0 +1,312 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+
+def test_fedavg_client_revert():
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from aijack.collaborative import FedAVGClient
+
+    torch.manual_seed(0)
+
+    lr = 0.1
+    client = FedAVGClient(nn.Linear(4, 2), lr=lr)
+    client.download(client.model.state_dict())
+    global_params = [param.detach().clone() for param in client.parameters()]
+
+    optimizer = optim.SGD(client.parameters(), lr=lr)
+    loss = client(torch.ones(3, 4)).sum()
+    loss.backward()
+    optimizer.step()
+
+    gradients = client.upload_gradients()
+    for grad, param in zip(gradients, client.parameters()):
+        torch.testing.assert_close(grad, param.grad)
+    # the snapshot of all parameters shares one contiguous buffer
+    torch.testing.assert_close(
+        torch.cat([p.reshape(-1) for p in client.prev_parameters]),
+        torch.cat([p.reshape(-1) for p in global_params]),
+    )
+    for p, next_p in zip(client.prev_parameters, client.prev_parameters[1:]):
+        assert next_p.data_ptr() == p.data_ptr() + p.numel() * p.element_size()
+
+    client.revert()
+    for param, global_param in zip(client.parameters(), global_params):
+        torch.testing.assert_close(param.detach(), global_param)
+
+
+def test_fedavg_client_snapshot_at_download():
+    import torch
+    import torch.nn as nn
+
+    from aijack.collaborative import FedAVGClient
+
+    model = nn.Linear(4, 2)
+    client = FedAVGClient(model)
+    # the client does not attach anything to the user's model
+    assert len(model._forward_pre_hooks) == 0
+
+    client.download(model.state_dict())
+    global_params = [param.detach().clone() for param in model.parameters()]
+    # the model is updated without going through the client
+    with torch.no_grad():
+        for param in model.parameters():
+            param.add_(1.0)
+    for prev_param, global_param in zip(client.prev_parameters, global_params):
+        torch.testing.assert_close(prev_param, global_param)
+    for grad in client.upload_gradients():
+        torch.testing.assert_close(grad, torch.full_like(grad, -1.0 / client.lr))
+
+
+def test_fedavg_client_prev_parameters():
+    import torch
+    import torch.nn as nn
+
+    from aijack.collaborative import FedAVGClient
+
+    # the buffers of the snapshot are allocated once the lazy module is materialized
+    client = FedAVGClient(nn.LazyLinear(3))
+    client(torch.ones(2, 4))
+    client.download(client.model.state_dict())
+    assert [p.shape for p in client.prev_parameters] == [(3, 4), (3,)]
+
+    # assignment replaces the list until the next snapshot
+    client.prev_parameters = []
+    for param in client.parameters():
+        client.prev_parameters.append(param.detach().clone() + 1.0)
+    for grad in client.upload_gradients():
+        torch.testing.assert_close(grad, torch.full_like(grad, 1.0 / client.lr))
+    client.download(client.model.state_dict())
+    assert len(client.prev_parameters) == 2
+
+
+def test_fedavg_server_update_from_gradients():
+    import numpy as np
+    import torch
+    import torch.nn as nn
+
+    from aijack.collaborative import FedAVGServer
+
+    server = FedAVGServer([0, 1, 2], nn.Linear(3, 2), server_side_update=False)
+    server.weight = np.array([0.5, 0.25, 0.25])
+    server.uploaded_gradients = [
+        [torch.full((2, 3), float(i)), torch.full((2,), -float(i))] for i in range(3)
+    ]
+    first_gradients = [grad.clone() for grad in server.uploaded_gradients[0]]
+
+    server.update_from_gradients()
+    torch.testing.assert_close(server.aggregated_gradients[0], torch.full((2, 3), 0.75))
+    torch.testing.assert_close(server.aggregated_gradients[1], torch.full((2,), -0.75))
+    # the accumulation does not modify the uploaded gradients
+    for grad, first_grad in zip(server.uploaded_gradients[0], first_gradients):
+        torch.testing.assert_close(grad, first_grad)
+
+
+def test_get_gradient_buckets():
+    import torch
+
+    from aijack.collaborative.core.utils import (
+        GradientBucketsHeader,
+        get_gradient_buckets,
+    )
+
+    numels = [256 * 1024, 10, 512 * 1024, 1024 * 1024]
+    buckets = get_gradient_buckets(numels, 4, bucket_cap_mb=2)
+
+    assert [p for p, _ in buckets] == [slice(0, 2), slice(2, 3), slice(3, 4)]
+    assert [e for _, e in buckets] == [
+        slice(0, 256 * 1024 + 10),
+        slice(256 * 1024 + 10, 768 * 1024 + 10),
+        slice(768 * 1024 + 10, 1792 * 1024 + 10),
+    ]
+
+    # the server recovers the same buckets from the header sent by the clients
+    header = GradientBucketsHeader(
+        torch.float32, [e.stop - e.start for _, e in buckets]
+    )
+    assert header.get_element_slices() == [e for _, e in buckets]
+
+
+def test_mpi_fedavg_sparse_gradient():
+    import pickle
+    from collections import defaultdict, deque
+
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from aijack.collaborative import (
+        FedAVGClient,
+        FedAVGServer,
+        MPIFedAVGClientManager,
+        MPIFedAVGServerManager,
+    )
+    from aijack.defense.sparse import (
+        SparseGradientClientManager,
+        SparseGradientServerManager,
+    )
+
+    class LocalComm:
+        """Passes pickled messages between the parties of this process."""
+
+        def __init__(self, rank, mailbox):
+            self.rank = rank
+            self.mailbox = mailbox
+
+        def send(self, obj, dest, tag):
+            self.mailbox[(self.rank, dest, tag)].append(pickle.dumps(obj))
+
+        def recv(self, source=None, tag=None):
+            for (src, dest, t), messages in self.mailbox.items():
+                if dest == self.rank and t == tag and source in (None, src):
+                    if len(messages) > 0:
+                        return pickle.loads(messages.popleft())
+            raise RuntimeError("no message to receive")
+
+    torch.manual_seed(0)
+
+    lr = 0.1
+    mailbox = defaultdict(deque)
+
+    MPISparseGradientFedAVGClient = MPIFedAVGClientManager().attach(
+        SparseGradientClientManager(k=0.5).attach(FedAVGClient)
+    )
+    MPISparseGradientFedAVGServer = MPIFedAVGServerManager().attach(
+        SparseGradientServerManager().attach(FedAVGServer)
+    )
+
+    clients = [
+        MPISparseGradientFedAVGClient(
+            LocalComm(client_id, mailbox), nn.Linear(4, 2), user_id=client_id, lr=lr
+        )
+        for client_id in [1, 2]
+    ]
+    server = MPISparseGradientFedAVGServer(
+        LocalComm(0, mailbox), [1, 2], nn.Linear(4, 2), lr=lr
+    )
+
+    server.mpi_initialize()
+    for client in clients:
+        client.mpi_initialize()
+
+    for client in clients:
+        optimizer = optim.SGD(client.parameters(), lr=lr)
+        client(torch.randn(3, 4)).sum().backward()
+        optimizer.step()
+        client.upload()
+
+    server.receive()
+    assert len(server.uploaded_gradients) == 2
+    for gradients in server.uploaded_gradients:
+        for grad, param in zip(gradients, server.server_model.parameters()):
+            assert grad.shape == param.shape
+            # the top 50% of the gradients are kept
+            assert (grad != 0).sum() == param.numel() // 2
+
+    server.update()
+    server.distribute()
+    for client in clients:
+        client.download()
+        for param, global_param in zip(
+            client.parameters(), server.server_model.parameters()
+        ):
+            torch.testing.assert_close(param.detach(), global_param.detach())
+
+
+_MPI_FEDAVG_DENSE_SCRIPT = """
+import torch
+import torch.nn as nn
+from mpi4py import MPI
+
+from aijack.collaborative import (
+    FedAVGClient,
+    FedAVGServer,
+    MPIFedAVGClientManager,
+    MPIFedAVGServerManager,
+)
+
+
+class CopyingFedAVGClient(FedAVGClient):
+    # overrides upload_gradients, so that the dense gradients are copied into the buffer
+    def upload_gradients(self):
+        return super().upload_gradients()
+
+
+def local_gradients(model, rank):
+    # exactly representable in every wire dtype
+    return [
+        rank * (torch.arange(p.numel()) % 8).view(p.shape).float() / 4
+        for p in model.parameters()
+    ]
+
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+lr = 0.5
+torch.manual_seed(0)
+
+for comm_dtype in [torch.float32, torch.bfloat16, torch.float16]:
+    for use_reduce in [False, True]:
+        for bucket_cap_mb in [0.0005, 25]:
+            for client_cls in [FedAVGClient, CopyingFedAVGClient]:
+                model = nn.Sequential(nn.Linear(20, 10), nn.Linear(10, 3))
+                if rank == 0:
+                    server = MPIFedAVGServerManager().attach(FedAVGServer)(
+                        comm, [1, 2], model, lr=lr, use_reduce=use_reduce
+                    )
+                    server.mpi_initialize()
+                    server.receive()
+
+                    expected = [local_gradients(model, r) for r in [1, 2]]
+                    if use_reduce:
+                        expected = [[(g1 + g2) / 2 for g1, g2 in zip(*expected)]]
+                    for buffer in server.gradient_buffers:
+                        # the received gradients do not alias the receive buffers
+                        buffer.zero_()
+                    assert len(server.uploaded_gradients) == len(expected)
+                    for gradients, expected_gradients in zip(
+                        server.uploaded_gradients, expected
+                    ):
+                        for grad, expected_grad in zip(gradients, expected_gradients):
+                            assert grad.dtype == torch.float32
+                            torch.testing.assert_close(
+                                grad, expected_grad, atol=1e-4, rtol=0
+                            )
+                else:
+                    client = MPIFedAVGClientManager().attach(client_cls)(
+                        comm,
+                        model,
+                        user_id=rank,
+                        lr=lr,
+                        use_reduce=use_reduce,
+                        comm_dtype=comm_dtype,
+                        bucket_cap_mb=bucket_cap_mb,
+                    )
+                    client.mpi_initialize()
+                    with torch.no_grad():
+                        for param, grad in zip(
+                            client.parameters(), local_gradients(model, rank)
+                        ):
+                            param.sub_(lr * grad)
+                    client.upload()
+                comm.Barrier()
+"""
+
+
+@pytest.mark.skipif(shutil.which("mpiexec") is None, reason="mpiexec is not found")
+def test_mpi_fedavg_dense_gradient(tmp_path):
+    script = tmp_path / "mpi_fedavg_dense.py"
+    script.write_text(_MPI_FEDAVG_DENSE_SCRIPT)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run(
+        ["mpiexec", "-n", "3", sys.executable, "-m", "mpi4py", str(script)],
+        env=env,
+        check=True,
+        timeout=300,
+    )
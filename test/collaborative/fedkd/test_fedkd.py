@@ -84,3 +84,38 @@ def test_fedkd():
 
     assert teacher_loss_log[1] < teacher_loss_log[0]
     assert student_loss_log[1] < student_loss_log[0]
+
+
+def test_fedkd_upload_gradients():
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from aijack.collaborative import FedKDClient
+
+    torch.manual_seed(0)
+
+    class Net(nn.Module):
+        def __init__(self):
+            super(Net, self).__init__()
+            self.lin = nn.Linear(4, 3)
+
+        def forward(self, x):
+            self.hidden_states = self.lin(x)
+            return self.hidden_states
+
+        def get_hidden_states(self):
+            return [self.hidden_states]
+
+    lr = 0.1
+    client = FedKDClient(Net(), Net(), nn.CrossEntropyLoss(), student_lr=lr)
+    client.download(client.model.state_dict())
+    optimizer = optim.SGD(client.parameters(), lr=lr)
+
+    # FedKDClient.loss runs the student model directly, not through the client
+    _, student_loss = client.loss(torch.randn(8, 4), torch.randint(0, 3, (8,)))
+    student_loss.backward()
+    optimizer.step()
+
+    for grad in client.upload_gradients():
+        assert grad.abs().sum() > 0
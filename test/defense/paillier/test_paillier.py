@@ -60,6 +60,171 @@ def test_paillier_torch():
         pt_5.decrypt(sk), torch.Tensor([26, 1, 27]), atol=1e-5, rtol=1
     )
 
+    pt_6 = pt_5 - pt_1
+    torch.testing.assert_close(
+        pt_6.decrypt(sk), torch.Tensor([13, 0.5, 13.5]), atol=1e-5, rtol=1
+    )
+
+
+def test_paillier_torch_batch_decrypt():
+    import torch  # noqa: F401
+
+    from aijack.defense.paillier import (  # noqa: F401
+        PaillierKeyGenerator,
+        PaillierTensor,
+    )
+
+    keygenerator = PaillierKeyGenerator(512)
+    pk, sk = keygenerator.generate_keypair()
+
+    x = np.arange(12).reshape(3, 4) / 4
+    pt = PaillierTensor(np.vectorize(lambda v: pk.encrypt(float(v)))(x), n_job=3)
+    torch.testing.assert_close(pt.decrypt(sk), torch.Tensor(x), atol=1e-5, rtol=1)
+    torch.testing.assert_close(pt.tensor(sk), torch.Tensor(x), atol=1e-5, rtol=1)
+
+    assert pt.shape == torch.Size([3, 4])
+    torch.testing.assert_close(pt.tensor(), torch.zeros(3, 4))
+
+
+def test_paillier_torch_matmul():
+    import torch  # noqa: F401
+
+    from aijack.defense.paillier import (  # noqa: F401
+        PaillierKeyGenerator,
+        PaillierTensor,
+    )
+
+    keygenerator = PaillierKeyGenerator(512)
+    pk, sk = keygenerator.generate_keypair()
+
+    x = np.array([[1, -0.5, 2], [0.25, 3, -1]])
+    pt = PaillierTensor(np.vectorize(lambda v: pk.encrypt(float(v)))(x))
+
+    w = torch.Tensor([[1, 2], [-0.5, 0], [0.1, 4]])
+    torch.testing.assert_close(
+        (pt @ w).decrypt(sk), torch.Tensor(x) @ w, atol=1e-5, rtol=1
+    )
+    torch.testing.assert_close(
+        torch.matmul(pt, w[:, 0]).decrypt(sk),
+        torch.Tensor(x) @ w[:, 0],
+        atol=1e-5,
+        rtol=1,
+    )
+
+
+def test_paillier_torch_batch_threads():
+    import torch  # noqa: F401
+
+    from aijack.defense.paillier import (  # noqa: F401
+        PaillierKeyGenerator,
+        PaillierTensor,
+    )
+
+    keygenerator = PaillierKeyGenerator(512)
+    pk, sk = keygenerator.generate_keypair()
+
+    # more elements than PAILLIER_MIN_CTS_PER_THREAD per thread, so that n_job=4
+    # actually runs on several threads
+    x = torch.linspace(-3, 3, 96).reshape(8, 12)
+    other = torch.linspace(1, 2, 12)
+    pt = PaillierTensor(
+        np.vectorize(lambda v: pk.encrypt(float(v)))(x.numpy()), n_job=4
+    )
+    pt_other = PaillierTensor(
+        np.vectorize(lambda v: pk.encrypt(float(v)))(x.numpy()), n_job=4
+    )
+
+    # scaling changes the exponents of the ciphertexts, so that the scalar additions
+    # below take the per-element alignment path
+    pt_half = pt * 0.5
+    x_half = x * 0.5
+
+    results = [
+        (pt_half + 1.25, x_half + 1.25),
+        (pt_half - 2, x_half - 2),
+        (pt_half + other, x_half + other),
+        (pt_half - other, x_half - other),
+        (pt_half * other, x_half * other),
+        (pt_half * 3, x_half * 3),
+        (pt_half + pt_other, x_half + x),
+        (pt_half - pt_other, x_half - x),
+    ]
+    for encrypted, expected in results:
+        torch.testing.assert_close(encrypted.decrypt(sk), expected, atol=1e-5, rtol=0)
+
+
+def test_paillier_torch_inplace():
+    import torch  # noqa: F401
+
+    from aijack.defense.paillier import (  # noqa: F401
+        PaillierKeyGenerator,
+        PaillierTensor,
+    )
+
+    keygenerator = PaillierKeyGenerator(512)
+    pk, sk = keygenerator.generate_keypair()
+
+    x = np.array([[1, -0.5], [0.25, 3]])
+    pt = PaillierTensor(np.vectorize(lambda v: pk.encrypt(float(v)))(x))
+    pt_other = PaillierTensor(np.vectorize(lambda v: pk.encrypt(float(v)))(x))
+    ciphertexts = pt.numpy()
+
+    assert pt.add_(pt_other) is pt
+    assert pt.numpy() is ciphertexts
+    pt.mul_(torch.Tensor([2, -1]))
+    pt -= 1
+    pt += torch.Tensor([0.5, 0.5])
+    pt *= 0.5
+
+    expected = ((torch.Tensor(x) * 2) * torch.Tensor([2, -1]) - 0.5) * 0.5
+    torch.testing.assert_close(pt.decrypt(sk), expected, atol=1e-5, rtol=1)
+    assert pt.numpy() is ciphertexts
+
+
+def test_paillier_FedAVG_server_update_from_gradients():
+    import torch
+    import torch.nn as nn
+
+    from aijack.collaborative.fedavg import FedAVGServer
+    from aijack.defense.paillier import PaillierKeyGenerator, PaillierTensor
+
+    keygenerator = PaillierKeyGenerator(512)
+    pk, sk = keygenerator.generate_keypair()
+
+    server = FedAVGServer([0, 1, 2], nn.Linear(2, 1), server_side_update=False)
+    server.weight = np.array([0.5, 0.25, 0.25])
+    plain_gradients = [
+        [torch.Tensor([[i, 2 * i]]), torch.Tensor([-i])] for i in range(1, 4)
+    ]
+    server.uploaded_gradients = [
+        [
+            PaillierTensor(np.vectorize(lambda v: pk.encrypt(float(v)))(grad.numpy()))
+            for grad in gradients
+        ]
+        for gradients in plain_gradients
+    ]
+
+    server.update_from_gradients()
+    torch.testing.assert_close(
+        server.aggregated_gradients[0].decrypt(sk),
+        torch.Tensor([[1.75, 3.5]]),
+        atol=1e-5,
+        rtol=1,
+    )
+    torch.testing.assert_close(
+        server.aggregated_gradients[1].decrypt(sk),
+        torch.Tensor([-1.75]),
+        atol=1e-5,
+        rtol=1,
+    )
+    # the gradients of the first client are not overwritten by the accumulation
+    torch.testing.assert_close(
+        server.uploaded_gradients[0][0].decrypt(sk),
+        torch.Tensor([[1, 2]]),
+        atol=1e-5,
+        rtol=1,
+    )
+
 
 def test_pailier_FedAVG():
     import torch